@@ -12,18 +12,24 @@ import pathlib
 from itertools import product
 import cdsapi
 import os
+import random
+import socket
 import time
 import threading
 import queue
-import logging, datetime
+import logging, logging.handlers, datetime
 import sys
+import dataclasses
 from tqdm import tqdm
 import urllib3
-import json5
+import json
+import re
 import yaml
 import argparse
+import netCDF4
 import xarray as xr
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional
 
@@ -38,11 +44,66 @@ _ALL_MONTHS = [f'{m:02d}' for m in range(1, 13)]
 _ALL_DAYS = [f'{d:02d}' for d in range(1, 32)]
 _ALL_HOURS = [f'{h:02d}:00' for h in range(24)]
 
+# Payload fields shared by every retrieve(); submit_request layers the
+# per-task variable/year (and pressure_level) on top via dict unpacking.
+_BASE_REQUEST = {
+    'product_type': ['reanalysis'],
+    'month': _ALL_MONTHS,
+    'day': _ALL_DAYS,
+    'time': _ALL_HOURS,
+    "data_format": "netcdf",
+    "download_format": "unarchived",
+}
+
+# Progress-bar updates are batched to this many bytes before hitting tqdm,
+# keeping its lock/render overhead off the per-chunk download hot path.
+_PBAR_FLUSH_BYTES = 16 * 1024 * 1024
+
+# Parallel range downloads: number of concurrent segments per file, and the
+# minimum remaining size worth splitting (below this a single stream wins).
+_RANGE_WORKERS = 8
+_MIN_PARALLEL_BYTES = 64 * 1024 * 1024
+
+# How often (in written bytes) the writer thread advises the kernel to drop
+# already-written pages, so a multi-GB download never piles up in page cache.
+_FADV_INTERVAL_BYTES = 256 * 1024 * 1024
+
+# Shared connection pool for every urllib3 download. Module scope keeps
+# keep-alive HTTPS connections to the CDS object store warm across files and
+# retry attempts instead of paying a fresh TLS handshake per call.
+# PoolManager is thread-safe, so all worker threads use the same instance.
+_HTTP_POOL = urllib3.PoolManager(
+    retries=urllib3.Retry(
+        total=10,                  # Maximum number of retries
+        backoff_factor=0.5,        # Backoff factor for retries
+        status_forcelist=[500, 502, 503, 504],  # Retry on these HTTP status codes
+        allowed_methods=["HEAD", "GET"]        # Only retry for these methods
+    ),
+    timeout=urllib3.Timeout(connect=30.0, read=1800.0),  # 30s connect, 30min read
+    # Sized for the worst case of several keys' download threads each running
+    # a parallel-range transfer at once; block=True caps connections at
+    # maxsize instead of spawning extras that are discarded after one use
+    # (the "Connection pool is full, discarding connection" churn).
+    maxsize=32,
+    block=True,
+    # A 4MB receive buffer lets the kernel keep absorbing the stream on this
+    # high-bandwidth-delay path while Python is busy handing chunks to the
+    # writer; the kernel clamps it to net.core.rmem_max where that is lower.
+    socket_options=urllib3.connection.HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024),
+    ],
+)
+
 
 @dataclass(frozen=True)
 class RequestTask:
-    """One CDS retrieve() to issue: payload fields plus path-pattern context."""
-    year: int
+    """One CDS retrieve() to issue: payload fields plus path-pattern context.
+
+    ``year`` is a single int for the common one-year-per-request layout, or a
+    tuple of ints when ``years_per_request`` > 1 batches consecutive years
+    into one CDS submission (the combined file is split locally afterwards).
+    """
+    year: object   # int | tuple[int, ...]
     variable: str
     dataset: str
     pressure_level: Optional[object]   # int | str | None at runtime
@@ -68,9 +129,13 @@ class ReportCollector:
         status:  'success' | 'skipped' | 'failed'
         stage:   None                      (for success/skipped)
                  'request'                 (retrieve() raised)
-                 'default_download'        (cdsapi download failed, no fallback URL)
-                 'fallback_download'       (all urllib3 attempts failed)
-        via:     'cdsapi' | 'urllib3'      (only set on success, else None)
+                 'default_download'        (no direct URL and cdsapi download failed)
+                 'fallback_download'       (urllib3 attempts and cdsapi fallback both failed)
+                 'post_process'            (download succeeded, but the multi-year
+                                            split or auto-detect rename failed)
+        via:     'urllib3' | 'cdsapi'      (only set on success, else None;
+                                            urllib3 is the primary path,
+                                            cdsapi the fallback)
         error:   str | None                (error message on failure)
     """
     def __init__(self):
@@ -111,10 +176,10 @@ class ReportCollector:
         out.info(f"Total tasks processed: {len(entries)}")
         out.info(f"  Successful downloads: {len(successes)}")
         if successes:
-            via_cdsapi  = sum(1 for e in successes if e['via'] == 'cdsapi')
             via_urllib3 = sum(1 for e in successes if e['via'] == 'urllib3')
-            out.info(f"    via cdsapi:  {via_cdsapi}")
-            out.info(f"    via urllib3 fallback: {via_urllib3}")
+            via_cdsapi  = sum(1 for e in successes if e['via'] == 'cdsapi')
+            out.info(f"    via urllib3: {via_urllib3}")
+            out.info(f"    via cdsapi fallback: {via_cdsapi}")
         out.info(f"  Skipped (already existed): {len(skipped)}")
         out.info(f"  Failed: {len(failures)}")
 
@@ -134,6 +199,90 @@ class ReportCollector:
                 out.info(f"  [{e['stage']}] {self._task_label(e)} :: {short}")
         out.info("=" * 60)
 
+class CircuitBreaker:
+    """
+    Per-key circuit breaker guarding CDS request submission.
+
+    Counts consecutive retrieve() failures for one API key. After
+    ``failure_threshold`` failures in a row the breaker opens and
+    ``wait_until_allowed`` holds that key's request threads back for
+    ``cooldown`` seconds instead of burning tasks against a dead or
+    rate-limited key. When the cooldown expires a single thread is let
+    through as a probe (half-open); a success closes the breaker again,
+    another failure restarts the cooldown.
+
+    Tasks are never requeued — a blocked thread simply waits before
+    pulling its next task, so the shared queue keeps feeding healthy keys.
+    """
+
+    def __init__(self, name, failure_threshold=5, cooldown=300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"Key {self.name}: circuit breaker open after "
+                    f"{self._consecutive_failures} consecutive request failures, "
+                    f"pausing submissions for {self.cooldown:.0f}s")
+
+    def wait_until_allowed(self):
+        """Block while the breaker is open; return once a call may proceed."""
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+                if remaining <= 0:
+                    if self._consecutive_failures >= self.failure_threshold:
+                        # Half-open: this caller probes the key; push the
+                        # window forward so other threads keep waiting until
+                        # the probe's outcome is recorded.
+                        self._open_until = time.monotonic() + self.cooldown
+                        logger.info(f"Key {self.name}: circuit breaker half-open, probing")
+                    return
+            time.sleep(min(remaining, 5.0))
+
+
+class SubmitRateLimiter:
+    """
+    Pace retrieve() submissions for one key to a minimum interval.
+
+    Download concurrency is sized separately by ``download_workers``; this
+    limiter only spaces out submissions, so several request threads freeing
+    up at once cannot burst a key against the CDS per-account queue limits.
+    An ``interval`` of 0 disables pacing entirely.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    def wait(self):
+        """Block until this key may submit again, then claim the next slot."""
+        if self.interval <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._next_allowed:
+                    self._next_allowed = now + self.interval
+                    return
+                delay = self._next_allowed - now
+            time.sleep(delay)
+
+
 def validate_key(key, url):
     """
     Validate a CDS API key before starting the task loop.
@@ -183,33 +332,195 @@ def validate_key(key, url):
         return False, str(e)
 
 
-def download_file_with_urllib3(url, target_path, chunk_size=1024*1024):
+def _preallocate(fd, size):
+    """
+    Reserve disk blocks for the whole file up front (best effort).
+
+    Growing a multi-GB file chunk by chunk makes the filesystem repeatedly
+    extend the inode/extent tree and fragments the allocation; fallocate
+    moves that metadata work off the write path. Unsupported platforms and
+    filesystems are silently ignored.
+    """
+    if size > 0 and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            pass
+
+
+def _drop_page_cache(path):
+    """
+    Advise the kernel that the file's pages will not be re-read soon.
+
+    Downloaded ERA5 files are written once and at most re-opened briefly for
+    metadata; leaving tens of GB in the page cache evicts hot pages from
+    everything else on the host over a multi-hour run. Best effort — missing
+    posix_fadvise or a failed open is silently ignored.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def _download_range(http, url, fd, start, end, chunk_size, pbar, pbar_lock):
+    """
+    Fetch bytes ``[start, end]`` of ``url`` and write them into ``fd`` at
+    their absolute offsets with ``os.pwrite`` (atomic per call, so segment
+    workers share the fd without locking).
+
+    Retries the remaining part of the segment up to 3 times so one flaky
+    range does not fail the whole file. Returns the number of bytes written;
+    raises on final failure.
+    """
+    offset = start
+    for attempt in range(1, 4):
+        response = http.request(
+            'GET', url,
+            headers={'Range': f'bytes={offset}-{end}'},
+            preload_content=False,
+        )
+        try:
+            if response.status != 206:
+                raise RuntimeError(
+                    f"Server returned {response.status} instead of 206 "
+                    f"for range {offset}-{end}"
+                )
+            pending = 0
+            for chunk in response.stream(chunk_size):
+                if chunk:
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    pending += len(chunk)
+                    if pending >= _PBAR_FLUSH_BYTES:
+                        with pbar_lock:
+                            pbar.update(pending)
+                        pending = 0
+            if pending:
+                with pbar_lock:
+                    pbar.update(pending)
+            if offset != end + 1:
+                raise RuntimeError(
+                    f"Range {start}-{end} incomplete: stopped at {offset}"
+                )
+            return offset - start
+        except Exception as e:
+            # Close before releasing so a connection with an unread body is
+            # never handed back to the shared pool for reuse.
+            try:
+                response.close()
+            except Exception:
+                pass
+            if attempt == 3:
+                raise
+            logger.warning(f"urllib3: Range {offset}-{end} failed ({e}), "
+                           f"retrying segment (attempt {attempt}/3)")
+        finally:
+            response.release_conn()
+
+
+def _download_ranges_parallel(http, url, target_path, start, total_size, chunk_size):
+    """
+    Download ``[start, total_size)`` of ``url`` into ``target_path`` using
+    concurrent HTTP Range requests, one thread per segment.
+
+    Multiple TCP streams fill high-bandwidth-delay links far better than the
+    single stream used by the sequential path. Raises on any segment failure;
+    the caller is responsible for falling back.
+    """
+    remaining = total_size - start
+    n_segments = min(_RANGE_WORKERS, max(1, remaining // _MIN_PARALLEL_BYTES + 1))
+    seg_size = remaining // n_segments
+    bounds = [start + i * seg_size for i in range(n_segments)] + [total_size]
+
+    fd = os.open(target_path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        _preallocate(fd, total_size)
+        pbar_lock = threading.Lock()
+        with tqdm(total=total_size, initial=start, unit='B', unit_scale=True,
+                  mininterval=0.25, miniters=_PBAR_FLUSH_BYTES, disable=None,
+                  desc=f"Downloading {os.path.basename(target_path)}") as pbar:
+            with ThreadPoolExecutor(max_workers=n_segments) as pool:
+                futures = [
+                    pool.submit(_download_range, http, url, fd,
+                                bounds[i], bounds[i + 1] - 1,
+                                chunk_size, pbar, pbar_lock)
+                    for i in range(n_segments)
+                ]
+                written = sum(future.result() for future in futures)
+    finally:
+        os.close(fd)
+
+    # The file size proves nothing here — _preallocate already extended it
+    # to total_size — so completeness is checked off the bytes each segment
+    # actually wrote.
+    if written != remaining:
+        raise RuntimeError(
+            f"Parallel download incomplete: segments wrote {written} bytes out of {remaining}"
+        )
+
+
+def _pipelined_writer(f, write_queue, failure):
+    """
+    Writer half of the download pipeline: drain chunks from ``write_queue``
+    and write them to ``f`` until a ``None`` sentinel arrives.
+
+    Runs in its own thread so disk writes overlap with socket reads instead
+    of serializing read-write-read-write on one thread. On a write error the
+    exception is recorded in ``failure`` and remaining chunks are discarded
+    so the producer never blocks on a full queue.
+
+    Every ``_FADV_INTERVAL_BYTES`` the already-written region is advised
+    DONTNEED so the kernel can reclaim those pages as writeback completes,
+    instead of caching the whole multi-GB file until the final drop.
+    """
+    written = 0
+    next_fadvise = _FADV_INTERVAL_BYTES
+    can_fadvise = hasattr(os, 'posix_fadvise')
+    while True:
+        chunk = write_queue.get()
+        if chunk is None:
+            break
+        if failure:
+            continue  # drain only; the reader will raise
+        try:
+            # The file may be unbuffered (raw), where write() can be partial.
+            view = memoryview(chunk)
+            while view:
+                view = view[f.write(view):]
+            written += len(chunk)
+            if can_fadvise and written >= next_fadvise:
+                f.flush()
+                try:
+                    os.posix_fadvise(f.fileno(), 0, written, os.POSIX_FADV_DONTNEED)
+                except OSError:
+                    can_fadvise = False
+                next_fadvise = written + _FADV_INTERVAL_BYTES
+        except Exception as e:
+            failure.append(e)
+
+
+def download_file_with_urllib3(url, target_path, chunk_size=8*1024*1024):
     """
     Download a file using urllib3 with retry and resume capabilities
 
     Args:
         url: URL to download
         target_path: Target file path
-        chunk_size: Size of chunks to download (1MB default)
+        chunk_size: Size of chunks to download (8MB default)
 
     Returns:
         bool: True if download was successful, False otherwise
     """
     try:
-        # Configure retry strategy
-        retry = urllib3.Retry(
-            total=10,                  # Maximum number of retries
-            backoff_factor=0.5,        # Backoff factor for retries
-            status_forcelist=[500, 502, 503, 504],  # Retry on these HTTP status codes
-            allowed_methods=["HEAD", "GET"]        # Only retry for these methods
-        )
-
-        # Create connection pool with retry strategy
-        http = urllib3.PoolManager(
-            retries=retry,
-            timeout=urllib3.Timeout(connect=30.0, read=1800.0),  # 30s connect, 30min read
-            maxsize=10                 # Connection pool size
-        )
+        # Shared module-level pool (see _HTTP_POOL) so connections stay warm
+        http = _HTTP_POOL
 
         # Check for partial download to resume
         headers = {}
@@ -222,16 +533,43 @@ def download_file_with_urllib3(url, target_path, chunk_size=1024*1024):
             mode = 'ab'
             logger.info(f"urllib3: Resuming download from byte {file_size}")
 
-        # Get content length with a HEAD request
-        head_response = http.request('HEAD', url, headers=headers)
-        total_size = int(head_response.headers.get('content-length', 0))
-
-        if 'Range' in headers and head_response.status == 206:  # Partial content
-            # For resumed download, add the existing file size to get total
-            if 'content-range' in head_response.headers:
+        # HEAD probe, needed only by the parallel path (segment bounds must
+        # be known before any GET is issued, and the probe doubles as the
+        # range-support check). The sequential path reads sizes off its own
+        # GET response, so a failed probe just skips the parallel attempt.
+        total_size = 0
+        supports_ranges = False
+        try:
+            head_response = http.request('HEAD', url, headers=headers)
+            total_size = int(head_response.headers.get('content-length', 0))
+            if 'Range' in headers and head_response.status == 206:  # Partial content
+                # For resumed download, add the existing file size to get total
                 content_range = head_response.headers.get('content-range', '')
                 if content_range and '/' in content_range:
                     total_size = int(content_range.split('/')[-1])
+            supports_ranges = (
+                head_response.status == 206
+                or head_response.headers.get('accept-ranges', '').lower() == 'bytes'
+            )
+        except Exception as e:
+            logger.warning(f"urllib3: HEAD probe failed ({e}), using single-stream download")
+
+        # Prefer parallel range segments when the server supports them and
+        # the remaining payload is large enough to be worth splitting.
+        if (supports_ranges and total_size > 0
+                and total_size - file_size >= _MIN_PARALLEL_BYTES):
+            try:
+                _download_ranges_parallel(http, url, target_path,
+                                          file_size, total_size, chunk_size)
+                logger.info(f"urllib3: Successfully downloaded {target_path} via parallel ranges")
+                _drop_page_cache(target_path)
+                return True
+            except Exception as e:
+                logger.warning(f"urllib3: Parallel range download failed for {target_path}: {e}. "
+                               f"Falling back to single stream")
+                # Segments may have left holes; discard everything written by
+                # the parallel attempt so the sequential resume stays valid.
+                os.truncate(target_path, file_size)
 
         # Start download
         response = http.request(
@@ -241,19 +579,122 @@ def download_file_with_urllib3(url, target_path, chunk_size=1024*1024):
             preload_content=False  # Stream the response
         )
 
-        # Initialize byte counter for progress tracking
-        downloaded_bytes = file_size
-        with tqdm(total=total_size, initial=file_size, unit='B', unit_scale=True,
-                  desc=f"Downloading {os.path.basename(target_path)}") as pbar:
-
-            with open(target_path, mode) as f:
-                for chunk in response.stream(chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_bytes += len(chunk)
-                        pbar.update(len(chunk))
-
-        response.release_conn()
+        # Everything from here until the slot is back in the pool runs under
+        # try/finally: with block=True a response abandoned on an error path
+        # permanently loses one of the shared pool's slots, and once slots
+        # run out every download thread blocks forever inside _get_conn.
+        try:
+            # The GET response carries the authoritative size: content-length
+            # for fresh downloads, the content-range total for resumed (206)
+            # ones — no separate HEAD round-trip required.
+            if response.status == 206:
+                content_range = response.headers.get('content-range', '')
+                if '/' in content_range:
+                    total_size = int(content_range.rsplit('/', 1)[-1])
+                else:
+                    total_size = file_size + int(response.headers.get('content-length', 0))
+            else:
+                total_size = int(response.headers.get('content-length', 0))
+                if 'Range' in headers:
+                    # Server ignored the resume request and is sending the whole
+                    # file; appending would corrupt the target, so start over.
+                    logger.warning(f"urllib3: Server ignored Range request for {target_path}, restarting from scratch")
+                    file_size = 0
+                    mode = 'wb'
+
+            # Initialize byte counter for progress tracking
+            downloaded_bytes = file_size
+            # Bounded queue between the socket reader (this thread) and a writer
+            # thread, so network reads and disk writes overlap instead of
+            # alternating. The bound caps buffered memory at ~16 chunks.
+            write_queue = queue.Queue(maxsize=16)
+            write_failure = []
+            # Progress updates are coalesced: tqdm.update takes a lock and
+            # re-renders the bar, which adds up to thousands of calls per file at
+            # one call per chunk. Flush the accumulated count every 16MB or 250ms.
+            pending_bytes = 0
+            last_flush = time.monotonic()
+            # disable=None turns the bars off entirely when stderr is not a TTY
+            # (batch jobs, nohup logs), skipping the redraws altogether.
+            with tqdm(total=total_size, initial=file_size, unit='B', unit_scale=True,
+                      mininterval=0.25, miniters=_PBAR_FLUSH_BYTES, disable=None,
+                      desc=f"Downloading {os.path.basename(target_path)}") as pbar:
+
+                # Unbuffered: chunks are already 8MB, so BufferedWriter would only
+                # add a memcpy of every byte on its way to the same write() call.
+                with open(target_path, mode, buffering=0) as f:
+                    _preallocate(f.fileno(), total_size)
+                    writer = threading.Thread(target=_pipelined_writer,
+                                              args=(f, write_queue, write_failure))
+                    writer.start()
+                    # Retry/backoff in urllib3 only covers connect and status
+                    # errors; once stream() is yielding, a dropped connection
+                    # surfaces as ProtocolError and would restart the file from
+                    # byte 0. Re-issue a ranged GET from the last enqueued byte
+                    # instead, up to a handful of times per file.
+                    resumes_left = 5
+                    can_resume = supports_ranges or response.status == 206
+                    try:
+                        while True:
+                            try:
+                                for chunk in response.stream(chunk_size):
+                                    if chunk:
+                                        if write_failure:
+                                            break
+                                        write_queue.put(chunk)
+                                        downloaded_bytes += len(chunk)
+                                        pending_bytes += len(chunk)
+                                        now = time.monotonic()
+                                        if (pending_bytes >= _PBAR_FLUSH_BYTES
+                                                or now - last_flush > 0.25):
+                                            pbar.update(pending_bytes)
+                                            pending_bytes = 0
+                                            last_flush = now
+                                break
+                            except (urllib3.exceptions.ProtocolError,
+                                    urllib3.exceptions.ReadTimeoutError) as e:
+                                if not can_resume or resumes_left <= 0:
+                                    raise
+                                resumes_left -= 1
+                                logger.warning(f"urllib3: Connection lost at byte {downloaded_bytes} for {target_path} ({e}), resuming in-stream")
+                                # Close and release the dead response before
+                                # rebinding, so its slot is back in the pool
+                                # whether or not stream()'s own error handling
+                                # already returned it.
+                                try:
+                                    response.close()
+                                except Exception:
+                                    pass
+                                response.release_conn()
+                                response = http.request(
+                                    'GET', url,
+                                    headers={'Range': f'bytes={downloaded_bytes}-'},
+                                    preload_content=False,
+                                )
+                                if response.status != 206:
+                                    raise RuntimeError(
+                                        f"Server did not honour mid-stream resume for {target_path} "
+                                        f"(status {response.status})")
+                        if pending_bytes:
+                            pbar.update(pending_bytes)
+                    finally:
+                        write_queue.put(None)
+                        writer.join()
+                    if write_failure:
+                        raise write_failure[0]
+        except BaseException:
+            # A failure can leave the body half-read; close the socket so a
+            # dirty connection is never handed back for reuse.
+            try:
+                response.close()
+            except Exception:
+                pass
+            raise
+        finally:
+            # No-op when the stream already auto-released on error, but the
+            # only path that returns the slot after close() or an abandoned
+            # body.
+            response.release_conn()
 
         # Verify if download is complete
         if total_size > 0 and downloaded_bytes < total_size:
@@ -261,6 +702,7 @@ def download_file_with_urllib3(url, target_path, chunk_size=1024*1024):
             return False
 
         logger.info(f"urllib3: Successfully downloaded {target_path}")
+        _drop_page_cache(target_path)
         return True
 
     except Exception as e:
@@ -279,8 +721,13 @@ def get_variable_code_from_netcdf(nc_file, api_variable):
     # Common auxiliary variables to exclude
     excluded = {'number', 'expver'}
     try:
-        with xr.open_dataset(nc_file) as ds:
-            candidates = [v for v in ds.data_vars if v not in excluded]
+        # netCDF4 only parses the file header here; xarray's open_dataset
+        # would additionally build indexes and run CF decoding, which is
+        # needless work right after a multi-GB download. Variables that are
+        # also dimensions are coordinate variables, not data.
+        with netCDF4.Dataset(nc_file, 'r') as ds:
+            candidates = [name for name in ds.variables
+                          if name not in excluded and name not in ds.dimensions]
 
         # Return the appropriate variable
         if api_variable in candidates:
@@ -345,7 +792,27 @@ def build_target_path(path_pattern, *, short_name, variable, year, dataset,
         ) from e
 
 
-def submit_request(client, request_task, worker_id=None, report=None):
+def target_exists_cached(target, dir_cache):
+    """
+    ``os.path.exists`` replacement backed by one ``os.scandir`` per directory.
+
+    Checking thousands of expected targets at enqueue time would issue one
+    stat syscall each; listing every output directory once and keeping the
+    names in ``dir_cache`` (directory -> set of file names) makes each check
+    an O(1) set lookup. Missing directories cache as an empty set.
+    """
+    directory = os.path.dirname(target) or '.'
+    names = dir_cache.get(directory)
+    if names is None:
+        try:
+            names = {entry.name for entry in os.scandir(directory)}
+        except FileNotFoundError:
+            names = set()
+        dir_cache[directory] = names
+    return os.path.basename(target) in names
+
+
+def submit_request(client, request_task, worker_id=None, report=None, breaker=None):
     """
     Submit a request to the CDS API and wait for the server to process it.
 
@@ -355,6 +822,7 @@ def submit_request(client, request_task, worker_id=None, report=None):
         request_task: ``RequestTask`` describing what to download.
         worker_id: Optional identifier for log prefixes.
         report: Optional ``ReportCollector`` to record outcome.
+        breaker: Optional ``CircuitBreaker`` told about retrieve() outcomes.
 
     Returns:
         DownloadTask ready for download, or None if the task was skipped
@@ -362,16 +830,37 @@ def submit_request(client, request_task, worker_id=None, report=None):
     """
     log_prefix = f"Worker {worker_id}: " if worker_id else ""
     rt = request_task
+    years = rt.year if isinstance(rt.year, tuple) else (rt.year,)
+
+    # Check for existing files before submitting to avoid wasting a server
+    # slot; for batched tasks, only the missing years are requested.
+    if rt.skip_existing:
+        if rt.short_name is None:
+            logger.warning(f"{log_prefix}skip_existing is True but no short_name provided for {rt.variable}. Cannot reliably check for existing files.")
+        else:
+            missing = []
+            for year in years:
+                year_target = build_target_path(
+                    rt.path_pattern,
+                    short_name=rt.short_name, variable=rt.variable,
+                    year=year, dataset=rt.dataset, pressure_level=rt.pressure_level,
+                )
+                if os.path.exists(year_target):
+                    logger.info(f"{log_prefix}Skip existing file {year_target} for variable {rt.variable}")
+                    if report is not None:
+                        report.add(year, rt.variable, rt.dataset, rt.pressure_level,
+                                   status='skipped')
+                else:
+                    missing.append(year)
+            if not missing:
+                return None
+            years = tuple(missing)
+            rt = dataclasses.replace(rt, year=years if len(years) > 1 else years[0])
 
     request = {
-        'product_type': ['reanalysis'],
+        **_BASE_REQUEST,
         'variable': [rt.variable],
-        'year': [str(rt.year)],
-        'month': _ALL_MONTHS,
-        'day': _ALL_DAYS,
-        'time': _ALL_HOURS,
-        "data_format": "netcdf",
-        "download_format": "unarchived"
+        'year': [str(y) for y in years],
     }
 
     if rt.dataset == "reanalysis-era5-pressure-levels":
@@ -379,39 +868,140 @@ def submit_request(client, request_task, worker_id=None, report=None):
             raise ValueError("pressure_level is required for reanalysis-era5-pressure-levels dataset")
         request["pressure_level"] = [rt.pressure_level]
 
+    # Batched tasks download to one combined file covering the year span;
+    # perform_download splits it into per-year files afterwards.
+    target_year = years[0] if len(years) == 1 else f"{years[0]}-{years[-1]}"
     target = build_target_path(
         rt.path_pattern,
         short_name=rt.short_name, variable=rt.variable,
-        year=rt.year, dataset=rt.dataset, pressure_level=rt.pressure_level,
+        year=target_year, dataset=rt.dataset, pressure_level=rt.pressure_level,
     )
 
-    # Check for existing files before submitting to avoid wasting a server slot
-    if rt.skip_existing:
-        if rt.short_name is None:
-            logger.warning(f"{log_prefix}skip_existing is True but no short_name provided for {rt.variable}. Cannot reliably check for existing files.")
-        else:
-            if os.path.exists(target):
-                logger.info(f"{log_prefix}Skip existing file {target} for variable {rt.variable}")
-                if report is not None:
-                    report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
-                               status='skipped')
-                return None
-
     logger.info(f"{log_prefix}Requesting {target}")
 
     try:
         result = client.retrieve(rt.dataset, request)
         logger.info(f"{log_prefix}Request completed, result ready for {target}")
+        if breaker is not None:
+            breaker.record_success()
         return DownloadTask(result=result, target=target, request=rt)
     except Exception as e:
         logger.error(f"{log_prefix}Request failed for {target}: {str(e)}")
         logger.error(traceback.format_exc())
+        if breaker is not None:
+            breaker.record_failure()
         if report is not None:
             report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
                        status='failed', stage='request', error=str(e))
         return None
 
 
+def _split_multiyear_file(combined_path, request_task, log_prefix=""):
+    """
+    Split a multi-year CDS download into the per-year files the rest of the
+    toolbox expects, then remove the combined file.
+
+    The variable short name is auto-detected from the combined file when the
+    task has none, mirroring the single-year rename logic.
+    """
+    rt = request_task
+    short_name = rt.short_name
+    if short_name is None:
+        short_name = get_variable_code_from_netcdf(combined_path, rt.variable)
+
+    # Probe the time coordinate name off the header so the real open can be
+    # chunked along it. Without chunks each per-year to_netcdf would pull a
+    # full year of decoded global hourly data (tens of GB) into this process;
+    # with a dask-backed open the copy streams chunk by chunk instead.
+    with netCDF4.Dataset(combined_path, 'r') as ds_meta:
+        time_name = 'valid_time' if 'valid_time' in ds_meta.variables else 'time'
+
+    # xarray refuses chunks= when dask is missing, so degrade to an eager
+    # open rather than failing every multi-year split in a bare environment.
+    try:
+        import dask  # noqa: F401
+        chunks = {time_name: 'auto'}
+    except ImportError:
+        logger.warning(f"{log_prefix}dask not available; splitting {combined_path} "
+                       f"eagerly (one full year in memory at a time)")
+        chunks = None
+
+    with xr.open_dataset(combined_path, chunks=chunks) as ds:
+        for year in rt.year:
+            year_target = build_target_path(
+                rt.path_pattern,
+                short_name=short_name, variable=rt.variable,
+                year=year, dataset=rt.dataset, pressure_level=rt.pressure_level,
+            )
+            year_dir = os.path.dirname(year_target)
+            if year_dir:
+                os.makedirs(year_dir, exist_ok=True)
+            # Same .part scheme as the downloads themselves: a kill mid-write
+            # must not leave a truncated file under the final name for
+            # skip_existing to trust on the next run.
+            year_part = year_target + ".part"
+            ds.sel({time_name: str(year)}).to_netcdf(year_part)
+            os.replace(year_part, year_target)
+            logger.info(f"{log_prefix}Extracted {year_target} from {combined_path}")
+
+    os.remove(combined_path)
+
+
+# Post-download steps (multi-year split, variable auto-detect + rename) run
+# on this small background pool so download threads go back to draining the
+# results queue instead of blocking on local NetCDF metadata work.
+# __main__ joins the pool after all worker threads finish.
+_POST_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="postproc")
+
+
+def _finalize_download(target, request_task, log_prefix="", report=None, via=None):
+    """Post-process a completed download: split multi-year files, or detect
+    the variable code and rename when no short_name was configured.
+
+    For tasks routed here the report entry is written from this function —
+    the per-year files (or the renamed file) are the actual deliverable, so
+    the task only counts as a success once post-processing finished, and a
+    failed split/rename is recorded as a 'post_process' failure instead of
+    disappearing behind an already-reported success.
+    """
+    rt = request_task
+    try:
+        if isinstance(rt.year, tuple) and len(rt.year) > 1:
+            _split_multiyear_file(target, rt, log_prefix)
+        elif rt.short_name is None:
+            # No separate existence check: the download just succeeded, so
+            # the file is there, and get_variable_code_from_netcdf already
+            # falls back to the API name if the open fails anyway.
+            actual_var_code = get_variable_code_from_netcdf(target, rt.variable)
+
+            final_target = build_target_path(
+                rt.path_pattern,
+                short_name=actual_var_code, variable=rt.variable,
+                year=rt.year, dataset=rt.dataset, pressure_level=rt.pressure_level,
+            )
+
+            if target != final_target:
+                if os.path.exists(final_target):
+                    logger.warning(f"{log_prefix}Final target {final_target} already exists, removing redundant file {target}")
+                    os.remove(target)
+                else:
+                    final_dir = os.path.dirname(final_target)
+                    if final_dir:
+                        os.makedirs(final_dir, exist_ok=True)
+                    os.rename(target, final_target)
+                    logger.info(f"{log_prefix}Renamed {target} to {final_target}")
+    except Exception as e:
+        logger.error(f"{log_prefix}Post-processing failed for {target}: {str(e)}")
+        logger.error(traceback.format_exc())
+        if report is not None:
+            report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
+                       status='failed', stage='post_process', error=str(e))
+        return
+    if report is not None:
+        report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
+                   status='success', via=via)
+
+
 def perform_download(download_task, worker_id=None, report=None):
     """
     Download a prepared CDS result to disk.
@@ -432,6 +1022,10 @@ def perform_download(download_task, worker_id=None, report=None):
     rt = download_task.request
     result = download_task.result
     target = download_task.target
+    # Download into a .part sibling and only os.replace() it into place on
+    # success, so a kill mid-download can never leave a truncated file under
+    # the final name for skip_existing to trust on the next run.
+    part_path = target + ".part"
 
     # Ensure the output directory exists before the downloader writes into it.
     target_dir = os.path.dirname(target)
@@ -443,66 +1037,59 @@ def perform_download(download_task, worker_id=None, report=None):
     failure_stage = None       # 'default_download' | 'fallback_download' on failure
 
     try:
-        try:
-            # Download method 1: cdsapi built-in
-            result.download(target)
-            logger.info(f"{log_prefix}Successfully downloaded {target} via cdsapi")
-            download_via = 'cdsapi'
-        except Exception as e:
-            logger.error(f"{log_prefix}Standard download failed for {target}: {str(e)}")
-            logger.error(traceback.format_exc())
+        # Primary path: direct urllib3 download via the result's object-store
+        # URL — it gets parallel ranges, resume, and the shared warm pool,
+        # where cdsapi's built-in download is a single plain stream. cdsapi
+        # remains the fallback (and the only path when no URL is exposed).
+        download_url = getattr(result, 'location', None)
+        if download_url is None:
+            logger.warning(f"{log_prefix}Could not get direct download URL, using cdsapi download for {target}")
+
+        if download_url:
+            for attempt in range(1, 4):
+                if attempt > 1:
+                    logger.info(f"{log_prefix}Retry attempt {attempt}/3 for {target} using urllib3")
+
+                if download_file_with_urllib3(download_url, part_path):
+                    logger.info(f"{log_prefix}Successfully downloaded {target} using urllib3")
+                    download_via = 'urllib3'
+                    break
+
+                if attempt < 3:
+                    # Full-jitter backoff: sleep anywhere in [0, cap] rather
+                    # than around the cap, so workers that failed together
+                    # spread their retries instead of re-colliding.
+                    wait_time = random.uniform(0, 60 * (2 ** (attempt - 1)))
+                    logger.info(f"{log_prefix}Waiting {wait_time:.0f} seconds before next attempt for {target} using urllib3")
+                    time.sleep(wait_time)
+            else:
+                logger.error(f"{log_prefix}All urllib3 download attempts failed for {target}, falling back to cdsapi")
 
-            # Download method 2: urllib3 via result.location
-            download_url = None
+        if download_via is None:
             try:
-                download_url = result.location
-            except AttributeError:
-                logger.warning(f"{log_prefix}Could not get direct download URL, cannot use urllib3 fallback")
-
-            if download_url:
-                for attempt in range(1, 4):
-                    if attempt > 1:
-                        logger.info(f"{log_prefix}Retry attempt {attempt}/3 for {target} using urllib3")
-
-                    if download_file_with_urllib3(download_url, target):
-                        logger.info(f"{log_prefix}Successfully downloaded {target} using urllib3")
-                        download_via = 'urllib3'
-                        break
-
-                    if attempt < 3:
-                        wait_time = 60 * (2 ** (attempt - 1))
-                        logger.info(f"{log_prefix}Waiting {wait_time} seconds before next attempt for {target} using urllib3")
-                        time.sleep(wait_time)
-                else:
-                    logger.error(f"{log_prefix}All download attempts failed for {target} using urllib3")
-                    failure_stage = 'fallback_download'
-                    raise RuntimeError(f"All urllib3 download attempts failed for {target}")
-            else:
-                failure_stage = 'default_download'
+                result.download(part_path)
+                logger.info(f"{log_prefix}Successfully downloaded {target} via cdsapi")
+                download_via = 'cdsapi'
+                _drop_page_cache(part_path)
+            except Exception as e:
+                logger.error(f"{log_prefix}cdsapi download failed for {target}: {str(e)}")
+                logger.error(traceback.format_exc())
+                failure_stage = 'fallback_download' if download_url else 'default_download'
                 raise
 
-        # Rename the file when short_name was not provided (auto-detect from NetCDF)
-        if rt.short_name is None and os.path.exists(target):
-            actual_var_code = get_variable_code_from_netcdf(target, rt.variable)
-
-            final_target = build_target_path(
-                rt.path_pattern,
-                short_name=actual_var_code, variable=rt.variable,
-                year=rt.year, dataset=rt.dataset, pressure_level=rt.pressure_level,
-            )
-
-            if target != final_target:
-                if os.path.exists(final_target):
-                    logger.warning(f"{log_prefix}Final target {final_target} already exists, removing redundant file {target}")
-                    os.remove(target)
-                else:
-                    final_dir = os.path.dirname(final_target)
-                    if final_dir:
-                        os.makedirs(final_dir, exist_ok=True)
-                    os.rename(target, final_target)
-                    logger.info(f"{log_prefix}Renamed {target} to {final_target}")
-
-        if report is not None:
+        # Both paths verified completeness while writing; publish the file
+        # atomically under its final name.
+        os.replace(part_path, target)
+
+        # Hand post-processing (multi-year split / auto-detect rename) to the
+        # background pool so this thread can start the next download at once.
+        # _finalize_download writes the report entry for these tasks once the
+        # split/rename outcome is known; reporting success here would hide a
+        # failed post-processing step from the final summary.
+        if (isinstance(rt.year, tuple) and len(rt.year) > 1) or rt.short_name is None:
+            _POST_POOL.submit(_finalize_download, target, rt, log_prefix,
+                              report=report, via=download_via)
+        elif report is not None:
             report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
                        status='success', via=download_via)
         return True
@@ -510,9 +1097,9 @@ def perform_download(download_task, worker_id=None, report=None):
     except Exception as e:
         logger.error(f"{log_prefix}Download failed for {target}: {str(e)}")
         logger.error(traceback.format_exc())
-        if os.path.exists(target):
-            logger.info(f"{log_prefix}Removing broken file {target}")
-            os.remove(target)
+        if os.path.exists(part_path):
+            logger.info(f"{log_prefix}Removing broken file {part_path}")
+            os.remove(part_path)
         if report is not None:
             report.add(rt.year, rt.variable, rt.dataset, rt.pressure_level,
                        status='failed',
@@ -521,7 +1108,8 @@ def perform_download(download_task, worker_id=None, report=None):
         return False
 
 
-def key_request_thread(key, task_queue, results_queue, worker_id, report=None):
+def key_request_thread(key, task_queue, results_queue, worker_id, report=None,
+                       breaker=None, limiter=None):
     """
     Request thread for one API key. Submits one retrieve() at a time.
 
@@ -530,23 +1118,33 @@ def key_request_thread(key, task_queue, results_queue, worker_id, report=None):
     per task because ``Client.last_state`` is an instance attribute — reusing
     a client across concurrent retrieve() calls corrupts its state.
 
+    When this key's ``breaker`` is open the thread waits *before* pulling
+    from ``task_queue``, so pending tasks stay available to healthy keys.
+
     Shutdown: the thread exits on a ``None`` sentinel from ``task_queue``.
     The caller must enqueue one sentinel per request thread after all real
     tasks. Sentinels for the download pool are handled separately by
     ``start_key_workers``' supervisor.
     """
     logger.info(f"Request thread {worker_id} started")
+    task_count = 0
     while True:
+        if breaker is not None:
+            breaker.wait_until_allowed()
         task = task_queue.get()
         if task is None:  # stop signal
             break
 
+        if limiter is not None:
+            limiter.wait()
         client = cdsapi.Client(url="https://cds.climate.copernicus.eu/api", key=key)
-        outcome = submit_request(client, task, worker_id=worker_id, report=report)
+        outcome = submit_request(client, task, worker_id=worker_id, report=report,
+                                 breaker=breaker)
+        task_count += 1
         if outcome is not None:
             results_queue.put(outcome)
 
-    logger.info(f"Request thread {worker_id} finished")
+    logger.info(f"Request thread {worker_id} finished after {task_count} task(s)")
 
 
 def key_download_thread(results_queue, worker_id, report=None):
@@ -558,15 +1156,18 @@ def key_download_thread(results_queue, worker_id, report=None):
     ``start_key_workers``' supervisor after all request threads finish.
     """
     logger.info(f"Download thread {worker_id} started")
+    task_count = 0
     while True:
         item = results_queue.get()
         if item is None:
             break
         perform_download(item, worker_id=worker_id, report=report)
-    logger.info(f"Download thread {worker_id} finished")
+        task_count += 1
+    logger.info(f"Download thread {worker_id} finished after {task_count} task(s)")
 
 
-def start_key_workers(key, shared_task_queue, download_workers=1, concurrent_requests=1, report=None):
+def start_key_workers(key, shared_task_queue, download_workers=1, concurrent_requests=1,
+                      report=None, submit_interval=0.0):
     """
     Start the request pipeline and download pool for a single API key.
 
@@ -579,17 +1180,24 @@ def start_key_workers(key, shared_task_queue, download_workers=1, concurrent_req
       downloads concurrently with ongoing request submissions.
     - 1 supervisor thread: waits for all request threads to finish, then sends
       the None sentinels that shut down the download pool.
+    - All request threads for the key share one ``CircuitBreaker``, so a key
+      that keeps failing retrieve() stops consuming tasks until its cooldown
+      passes.
 
     Args:
         key: CDS API key
         shared_task_queue: Shared task queue across all keys
         download_workers: Number of parallel download threads per key (default 1)
         concurrent_requests: Number of concurrent request threads per key (default 1)
+        submit_interval: Minimum seconds between retrieve() submissions on
+            this key, shared across its request threads (0 = no pacing)
 
     Returns:
         list: All spawned threads (request threads + download threads + supervisor)
     """
     results_queue = queue.Queue()
+    breaker = CircuitBreaker(name=key[:4])
+    limiter = SubmitRateLimiter(submit_interval)
     threads = []
 
     # Start download pool first so it is ready before the first result arrives
@@ -605,7 +1213,7 @@ def start_key_workers(key, shared_task_queue, download_workers=1, concurrent_req
     for i in range(concurrent_requests):
         req = threading.Thread(target=key_request_thread,
                                args=(key, shared_task_queue, results_queue,
-                                     f"{key[:4]}:req{i}", report))
+                                     f"{key[:4]}:req{i}", report, breaker, limiter))
         req.daemon = True
         req.start()
         req_threads.append(req)
@@ -663,6 +1271,22 @@ def filter_valid_keys(keys, url="https://cds.climate.copernicus.eu/api"):
     return valid
 
 
+def _parse_keys_json(text):
+    """
+    Parse the keys file with stdlib ``json``, tolerating the two JSON5
+    conveniences the documented format uses: ``//`` comments and trailing
+    commas. Falls back to the (much slower, pure-Python) ``json5`` parser
+    for anything fancier, so existing key files keep working.
+    """
+    cleaned = re.sub(r'//[^\n]*', '', text)
+    cleaned = re.sub(r',(\s*[}\]])', r'\1', cleaned)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        import json5
+        return json5.loads(text)
+
+
 def load_api_keys(keys_file='cdsapi_keys.json'):
     """Load API keys from a JSON file using JSON5 parser (supports comments)
 
@@ -694,7 +1318,7 @@ def load_api_keys(keys_file='cdsapi_keys.json'):
 
     try:
         with open(keys_file, 'r') as f:
-            data = json5.load(f)
+            data = _parse_keys_json(f.read())
     except Exception as e:
         logger.error(f"Error reading {keys_file}: {str(e)}")
         raise RuntimeError(f"Error reading {keys_file}. Please ensure it is readable and contains valid JSON. Underlying error: {str(e)}") from e
@@ -773,6 +1397,12 @@ def load_config_from_yaml(yaml_path):
     api_keys_file = raw.get('api_keys_file', None)
     concurrent_requests = int(raw.get('concurrent_requests', 4))
     download_workers = int(raw.get('download_workers', 1))
+    years_per_request = int(raw.get('years_per_request', 1))
+    if years_per_request < 1:
+        raise ValueError("'years_per_request' must be >= 1")
+    submit_interval = float(raw.get('submit_interval', 0))
+    if submit_interval < 0:
+        raise ValueError("'submit_interval' must be >= 0")
     skip_existing = bool(raw.get('skip_existing', True))
     short_names = raw.get('short_names', None)
 
@@ -794,6 +1424,8 @@ def load_config_from_yaml(yaml_path):
         'api_keys_file': api_keys_file,
         'concurrent_requests': concurrent_requests,
         'download_workers': download_workers,
+        'years_per_request': years_per_request,
+        'submit_interval': submit_interval,
         'skip_existing': skip_existing,
         'short_names': short_names,
         'folder_pattern': folder_pattern,
@@ -801,6 +1433,33 @@ def load_config_from_yaml(yaml_path):
     }
 
 
+def setup_queue_logging(log_filename):
+    """
+    Route all logging through a QueueHandler/QueueListener pair.
+
+    File and console writes block — a slow terminal or fsync-heavy disk
+    would otherwise stall whichever worker thread happens to log. With
+    this setup every thread only pays a queue put; the actual I/O runs on
+    the listener's dedicated thread.
+
+    Returns the started listener; the caller must ``stop()`` it before
+    exiting so buffered records are flushed.
+    """
+    log_queue = queue.SimpleQueue()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.FileHandler(log_filename), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return listener
+
+
 if __name__ == '__main__':
     ####################
     # CLI Interface
@@ -832,6 +1491,8 @@ if __name__ == '__main__':
         api_keys_file     = config['api_keys_file']
         concurrent_requests = config['concurrent_requests']
         download_workers  = config['download_workers']
+        years_per_request = config['years_per_request']
+        submit_interval   = config['submit_interval']
         skip_existing     = config['skip_existing']
         short_names       = config['short_names']
         folder_pattern    = config['folder_pattern']
@@ -853,6 +1514,14 @@ if __name__ == '__main__':
         concurrent_requests = 4
         # Number of parallel download threads per key.
         download_workers = 1
+        # Number of consecutive years to batch into one CDS request.
+        # Each submitted job pays its own CDS queue wait (often minutes), so
+        # batching years cuts the number of queue waits proportionally; the
+        # combined file is split into per-year files locally after download.
+        years_per_request = 1
+        # Minimum seconds between retrieve() submissions per key (0 = no
+        # pacing). Spaces out bursts against the CDS per-account queue limit.
+        submit_interval = 0
         skip_existing = True  # Whether to skip downloading existing files (requires short_names if True)
         # Optional: Provide short names for variables.
         # If skip_existing=True, short_names MUST be provided for reliable operation.
@@ -870,14 +1539,7 @@ if __name__ == '__main__':
     # Configure logging
     current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = f"era5_download_{current_time}.log"
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    log_listener = setup_queue_logging(log_filename)
     logger.info(f"ERA5 Downloader Version: {__version__}")
     logger.info(f"Configuration source: {config_source}")
 
@@ -914,6 +1576,10 @@ if __name__ == '__main__':
     logger.info(f"API Keys (first 4 digits): {', '.join(key_prefixes)}")
     logger.info(f"Concurrent requests per key: {concurrent_requests}")
     logger.info(f"Download workers per key: {download_workers}")
+    if years_per_request > 1:
+        logger.info(f"Years per request: {years_per_request}")
+    if submit_interval > 0:
+        logger.info(f"Submit interval per key: {submit_interval}s")
     logger.info(f"Skip existing files: {skip_existing}")
     if short_names:
         logger.info(f"Using short names: {short_names}")
@@ -932,11 +1598,35 @@ if __name__ == '__main__':
 
     # Fill the queue with all year-variable-pressure_level combinations
     # (levels collapses to [None] for datasets without pressure levels).
+    # Years are grouped into batches of years_per_request per task.
     levels = pressure_levels or [None]
-    for year, var, level in product(years, variables, levels):
+    years_list = list(years)
+    year_batches = [tuple(years_list[i:i + years_per_request])
+                    for i in range(0, len(years_list), years_per_request)]
+    # Skip already-downloaded targets here rather than in the workers: one
+    # directory listing per output dir replaces a stat call per task, and
+    # complete tasks never occupy a queue slot.
+    existing_dir_cache = {}
+    for batch, var, level in product(year_batches, variables, levels):
         var_short_name = short_names.get(var) if short_names else None
+        if skip_existing and var_short_name is not None:
+            remaining = []
+            for year in batch:
+                year_target = build_target_path(
+                    path_pattern,
+                    short_name=var_short_name, variable=var,
+                    year=year, dataset=dataset, pressure_level=level,
+                )
+                if target_exists_cached(year_target, existing_dir_cache):
+                    logger.info(f"Skip existing file {year_target} for variable {var}")
+                    report.add(year, var, dataset, level, status='skipped')
+                else:
+                    remaining.append(year)
+            if not remaining:
+                continue
+            batch = tuple(remaining)
         shared_task_queue.put(RequestTask(
-            year=year, variable=var, dataset=dataset,
+            year=batch[0] if len(batch) == 1 else batch, variable=var, dataset=dataset,
             pressure_level=level, short_name=var_short_name,
             skip_existing=skip_existing, path_pattern=path_pattern,
         ))
@@ -951,12 +1641,14 @@ if __name__ == '__main__':
     # Start pipeline (request thread + download pool) for each key
     all_threads = []
     for key in cdsapi_keys:
-        key_threads = start_key_workers(key, shared_task_queue, download_workers, concurrent_requests, report=report)
+        key_threads = start_key_workers(key, shared_task_queue, download_workers, concurrent_requests,
+                                        report=report, submit_interval=submit_interval)
         all_threads.extend(key_threads)
 
-    # Wait for all threads to complete
+    # Wait for all threads to complete, then drain outstanding post-processing
     for t in all_threads:
         t.join()
+    _POST_POOL.shutdown(wait=True)
 
     # Calculate elapsed time
     elapsed = int(time.time() - start_time)
@@ -967,3 +1659,4 @@ if __name__ == '__main__':
 
     # Final summary report
     report.print_summary()
+    log_listener.stop()
@@ -11,6 +11,7 @@ import os
 import sys
 import netCDF4 as nc
 import glob
+from concurrent.futures import ThreadPoolExecutor
 
 def add_history_attribute(filename):
     """Add history attribute to a NetCDF file"""
@@ -53,12 +54,14 @@ def main():
     
     print(f'Found {len(files)} NetCDF files to process')
     
-    success_count = 0
-    for file in files:
-        success = add_history_attribute(file)
-        if success:
-            success_count += 1
-    
+    # Each file is touched independently and the cost is almost entirely
+    # HDF5 open/close latency, which releases the GIL inside the C library,
+    # so a thread pool turns thousands of serial ~10-50ms opens into
+    # parallel ones.
+    with ThreadPoolExecutor(max_workers=min(32, len(files))) as executor:
+        results = list(executor.map(add_history_attribute, files))
+    success_count = sum(results)
+
     print(f'Processed {success_count} of {len(files)} files successfully')
 
 if __name__ == '__main__':
@@ -15,15 +15,30 @@ Usage:
 
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import xarray as xr
 import earthkit.meteo.thermo.array.thermo as thermo
 from dask.distributed import Client
 
 
-def calculate_relative_humidity(t2m_file, d2m_file, output_file, chunk_size=50):
+def open_inputs(t2m_file, d2m_file, chunk_size=50):
+    """
+    Open and chunk the two input datasets.
+
+    Split out of calculate_relative_humidity so the opens (header parse plus
+    first reads, ~seconds each) can be prefetched for the next year while the
+    current year is still compressing.
+    """
+    ds_t2m = xr.open_dataset(t2m_file).chunk({"latitude": chunk_size, "longitude": chunk_size})
+    ds_d2m = xr.open_dataset(d2m_file).chunk({"latitude": chunk_size, "longitude": chunk_size})
+    return ds_t2m, ds_d2m
+
+
+def calculate_relative_humidity(t2m_file, d2m_file, output_file, chunk_size=50, inputs=None):
     """
     Calculate relative humidity from temperature and dew point temperature.
-    
+
     Parameters:
     -----------
     t2m_file : str
@@ -34,17 +49,18 @@ def calculate_relative_humidity(t2m_file, d2m_file, output_file, chunk_size=50):
         Path to save the resulting humidity data
     chunk_size : int, optional
         Size of chunks for dask processing
+    inputs : tuple, optional
+        Pre-opened (ds_t2m, ds_d2m) from open_inputs, e.g. a prefetched pair
     """
     print(f"Processing: {t2m_file} and {d2m_file}")
     print(f"Output will be saved to: {output_file}")
-    
+
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    # Load and chunk the datasets
-    ds_t2m = xr.open_dataset(t2m_file).chunk({"latitude": chunk_size, "longitude": chunk_size})
-    ds_d2m = xr.open_dataset(d2m_file).chunk({"latitude": chunk_size, "longitude": chunk_size})
-    
+
+    # Load and chunk the datasets (unless a prefetched pair was handed in)
+    ds_t2m, ds_d2m = inputs if inputs is not None else open_inputs(t2m_file, d2m_file, chunk_size)
+
     # Calculate relative humidity using earthkit
     print("Calculating relative humidity...")
     da_r2m = xr.apply_ufunc(
@@ -54,9 +70,11 @@ def calculate_relative_humidity(t2m_file, d2m_file, output_file, chunk_size=50):
         dask="parallelized"
     )
     
-    # Compute the result (this may take some time for large datasets)
-    da_r2m = da_r2m.compute()
-    
+    # No .compute() here: da_r2m stays dask-backed so to_netcdf evaluates
+    # and writes it chunk by chunk — peak memory is a few chunks instead of
+    # the whole year (>30 GB at 0.25 degree hourly), and compression of one
+    # chunk overlaps with computing the next.
+
     # Set metadata attributes
     da_r2m = da_r2m.assign_attrs({
         "units": "%",
@@ -70,37 +88,66 @@ def calculate_relative_humidity(t2m_file, d2m_file, output_file, chunk_size=50):
     # Rename to r2m
     da_r2m = da_r2m.rename("r2m")
     
-    # Save to NetCDF file with compression
+    # Save to NetCDF file with compression. Relative humidity is packed to
+    # int16 with a 0.01% resolution (CF scale/offset convention): half the
+    # bytes of float32 before compression even starts, and readers unpack to
+    # float transparently.
+    packing = {
+        "dtype": "int16",
+        "scale_factor": 0.01,
+        "add_offset": 0.0,
+        "_FillValue": np.int16(-32768),
+    }
     print(f"Saving result to {output_file}")
-    da_r2m.to_netcdf(
-        output_file,
-        encoding={"r2m": {"zlib": True, "complevel": 1}}
-    )
-    
+    try:
+        # Zstandard (libnetcdf >= 4.9) compresses several times faster than
+        # zlib at a similar ratio, so the write step stops being DEFLATE-bound.
+        da_r2m.to_netcdf(
+            output_file,
+            encoding={"r2m": dict(packing, compression="zstd", complevel=3)},
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"Zstandard compression unavailable ({e}), falling back to zlib")
+        da_r2m.to_netcdf(
+            output_file,
+            encoding={"r2m": dict(packing, zlib=True, complevel=1)},
+        )
+
+    ds_t2m.close()
+    ds_d2m.close()
+
     print("Done!")
     return output_file
 
 
-def process_year(year, t2m_dir, d2m_dir, out_dir):
+def input_files_for_year(year, t2m_dir, d2m_dir):
+    """Build the t2m/d2m input paths for one year."""
+    t2m_file = os.path.join(t2m_dir, f"era5.reanalysis.t2m.1hr.0p25deg.global.{year}.nc")
+    d2m_file = os.path.join(d2m_dir, f"era5.reanalysis.d2m.1hr.0p25deg.global.{year}.nc")
+    return t2m_file, d2m_file
+
+
+def process_year(year, t2m_dir, d2m_dir, out_dir, inputs=None):
     """
     Process a single year of ERA5 data.
-    
+
     Parameters:
     -----------
     year : int
         Year to process
     base_dir : str, optional
         Base directory for ERA5 data, defaults to current directory
-    
+    inputs : tuple, optional
+        Pre-opened (ds_t2m, ds_d2m) for this year's files
+
     Returns:
     --------
     str
         Path to the output file
     """
-    
+
     # Define file paths
-    t2m_file = os.path.join(t2m_dir, f"era5.reanalysis.t2m.1hr.0p25deg.global.{year}.nc")
-    d2m_file = os.path.join(d2m_dir, f"era5.reanalysis.d2m.1hr.0p25deg.global.{year}.nc")
+    t2m_file, d2m_file = input_files_for_year(year, t2m_dir, d2m_dir)
     r2m_dir = out_dir
     os.makedirs(r2m_dir, exist_ok=True)
     output_file = os.path.join(r2m_dir, f"era5.reanalysis.r2m.1hr.0p25deg.global.{year}.nc")
@@ -112,7 +159,7 @@ def process_year(year, t2m_dir, d2m_dir, out_dir):
         raise FileNotFoundError(f"Dew point file not found: {d2m_file}")
     
     # Calculate relative humidity
-    return calculate_relative_humidity(t2m_file, d2m_file, output_file)
+    return calculate_relative_humidity(t2m_file, d2m_file, output_file, inputs=inputs)
 
 
 def main():
@@ -140,14 +187,31 @@ def main():
     
     print(f"Processing years: {years_to_process}")
     
-    # Process each year
+    # Process each year, prefetching the next year's opens (depth 1) so the
+    # open_dataset latency hides behind the current year's compression.
+    def prefetch(year):
+        t2m_file, d2m_file = input_files_for_year(year, args.t2m_dir, args.d2m_dir)
+        if not (os.path.exists(t2m_file) and os.path.exists(d2m_file)):
+            return None  # process_year will raise the proper error
+        return open_inputs(t2m_file, d2m_file)
+
     output_files = []
-    for year in years_to_process:
-        try:
-            output_file = process_year(year, args.t2m_dir, args.d2m_dir, args.out_dir)
-            output_files.append(output_file)
-        except Exception as e:
-            print(f"Error processing year {year}: {e}")
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = prefetcher.submit(prefetch, years_to_process[0])
+        for i, year in enumerate(years_to_process):
+            current = pending
+            if i + 1 < len(years_to_process):
+                pending = prefetcher.submit(prefetch, years_to_process[i + 1])
+            # result() re-raises open_inputs failures (e.g. a corrupt file)
+            # from the prefetch thread, so it sits inside the per-year
+            # try: one bad year must not abort the remaining ones.
+            try:
+                inputs = current.result()
+                output_file = process_year(year, args.t2m_dir, args.d2m_dir, args.out_dir,
+                                           inputs=inputs)
+                output_files.append(output_file)
+            except Exception as e:
+                print(f"Error processing year {year}: {e}")
     
     print("\nSummary:")
     print(f"Successfully processed {len(output_files)} out of {len(years_to_process)} years.")
@@ -23,13 +23,19 @@ Advanced Usage:
         for var in d q t; do for pres in 500hpa 1000hpa; do combined="${var}.${pres}"; python resampler_ERA5.py $(seq 2003 2021) --variable $combined --input-dir hour/${var} --output-dir day/${var} --workers 20 --method mean --chunk-size 150; done; done
 """
 
+import netCDF4
+import numpy as np
 import xarray as xr
-import earthkit.transforms.aggregate
+import dask
 import dask.distributed
 import argparse
 import os
 import logging
-import gc
+import math
+import subprocess
+import threading
+import psutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 
@@ -68,8 +74,86 @@ def setup_logging(log_level=logging.INFO, log_dir=None):
     return logging.getLogger("ERA5_toolbox.resampler_ERA5")
 
 
-def process_year(year, variable="tp", input_dir='./', output_dir='./day', 
-                 chunk_size=180, client=None, method="sum", time_shift_hours=None):
+# One lock per rechunk destination, created on first use.
+_rechunk_locks = {}
+_rechunk_locks_guard = threading.Lock()
+
+
+def _rechunk_dst_lock(dst_file):
+    """Return the lock serializing rechunks of one destination file."""
+    with _rechunk_locks_guard:
+        return _rechunk_locks.setdefault(dst_file, threading.Lock())
+
+
+def rechunk_input_file(src_file, scratch_dir, chunk_size, logger):
+    """
+    Rewrite one hourly input as NetCDF-4 with HDF5 chunks matching the daily
+    reduce's access pattern (one day of hours x spatial tile).
+
+    CDS delivers files chunked for whole-field reads, so the time-grouped
+    reads here are badly non-contiguous on disk; a one-time nccopy into a
+    scratch directory makes them streaming. Already-rechunked files are
+    reused, and any failure (no nccopy binary, odd file layout) falls back
+    to the original file with a warning.
+
+    nccopy writes to a .part sibling that is renamed into place only on
+    success, so a run killed mid-copy never leaves a truncated file under the
+    final name for the existence check to trust. A per-destination lock
+    serializes concurrent callers (adjacent years share their shifted-year
+    input under --concurrent-years), so one thread never opens a file another
+    is still writing.
+    """
+    os.makedirs(scratch_dir, exist_ok=True)
+    dst_file = os.path.join(scratch_dir, os.path.basename(src_file))
+    with _rechunk_dst_lock(dst_file):
+        if os.path.exists(dst_file):
+            return dst_file
+        part_file = dst_file + ".part"
+        chunk_spec = f"valid_time/24,latitude/{chunk_size},longitude/{chunk_size}"
+        logger.info(f"Rechunking {src_file} -> {dst_file} ({chunk_spec})")
+        try:
+            subprocess.run(["nccopy", "-k", "4", "-w", "-c", chunk_spec, src_file, part_file],
+                           check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"nccopy rechunk failed for {src_file}: {e}. Using the original file.")
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            return src_file
+        os.replace(part_file, dst_file)
+    return dst_file
+
+
+# GRIB_stepType per variable, filled by _detect_step_type. Every year of one
+# variable carries the same step type, so it is read from the first year's
+# file only.
+_step_type_cache = {}
+
+
+def _detect_step_type(current_file, variable, logger):
+    """
+    Read the GRIB_stepType attribute of the data variable, cached per variable.
+
+    Uses a plain netCDF4 header open instead of xr.open_dataset: only one
+    attribute is needed, so building lazy arrays and decoding CF metadata for
+    the whole file is wasted work repeated every year.
+    """
+    if variable in _step_type_cache:
+        return _step_type_cache[variable]
+    with netCDF4.Dataset(current_file, 'r') as ds_meta:
+        excluded = {'longitude', 'latitude', 'time', 'valid_time', 'expver', 'number'}
+        data_var = next((name for name in ds_meta.variables
+                         if name not in excluded and name not in ds_meta.dimensions), None)
+        step_type = getattr(ds_meta.variables[data_var], 'GRIB_stepType', None) \
+            if data_var is not None else None
+    _step_type_cache[variable] = step_type
+    if step_type is not None:
+        logger.info(f"Found GRIB_stepType attribute: {step_type}")
+    return step_type
+
+
+def process_year(year, variable="tp", input_dir='./', output_dir='./day',
+                 chunk_size=180, client=None, method="sum", time_shift_hours=None,
+                 rechunk_inputs=False, compression="zlib", output_format="netcdf"):
     """
     Process a single year of hourly ERA5 data to daily statistics
     
@@ -92,6 +176,15 @@ def process_year(year, variable="tp", input_dir='./', output_dir='./day',
     time_shift_hours : int or None
         Time shift in hours (default: None). Use 'none' for no time shift.
         Negative for forward shift, positive for backward shift.
+    rechunk_inputs : bool
+        Rewrite inputs via nccopy into <input_dir>/rechunked with HDF5
+        chunks matching the daily-reduce access pattern (default: False)
+    compression : str
+        Output codec, "zlib" or "zstd" (default: "zlib"). zstd needs
+        libnetcdf >= 4.9 and falls back to zlib when unavailable.
+    output_format : str
+        "netcdf" (default) or "zarr"; zarr writes chunks as independent
+        objects so workers never contend on a single file handle.
     """
     logger = logging.getLogger("ERA5_resampler")
     
@@ -102,33 +195,22 @@ def process_year(year, variable="tp", input_dir='./', output_dir='./day',
         logger.error(f"Current year file not found: {current_file}")
         raise FileNotFoundError(f"Current year file not found: {current_file}")
     
-    # TODO: get data_var from current_file for later use; decouple "variable" in file name from data_var
-    
     # Determine time_shift_hours based on data type if not explicitly set
     if time_shift_hours is None:
         try:
-            # Open the NetCDF file and read the attribute
-            with xr.open_dataset(current_file) as temp_ds:
-                # Get the first (and typically only) data variable name
-                data_var = list(temp_ds.data_vars)[0]
-                
-                # Check if the GRIB_stepType attribute exists
-                if 'GRIB_stepType' in temp_ds[data_var].attrs:
-                    step_type = temp_ds[data_var].attrs['GRIB_stepType']
-                    logger.info(f"Found GRIB_stepType attribute: {step_type}")
-                    
-                    if step_type in ["accum", "avg", "mean"]:
-                        time_shift_hours = -1
-                        logger.info(f"Setting time_shift_hours = -1 for accumulated variable")
-                    elif step_type == "instant":
-                        time_shift_hours = 0
-                        logger.info(f"Setting time_shift_hours = 0 for instantaneous variable")
-                    else:
-                        logger.warning(f"Unknown GRIB_stepType: {step_type}, defaulting to time_shift_hours = 0")
-                        time_shift_hours = 0
-                else:
-                    logger.warning(f"No GRIB_stepType attribute found, defaulting to time_shift_hours = 0")
-                    time_shift_hours = 0
+            step_type = _detect_step_type(current_file, variable, logger)
+            if step_type in ["accum", "avg", "mean"]:
+                time_shift_hours = -1
+                logger.info(f"Setting time_shift_hours = -1 for accumulated variable")
+            elif step_type == "instant":
+                time_shift_hours = 0
+                logger.info(f"Setting time_shift_hours = 0 for instantaneous variable")
+            elif step_type is None:
+                logger.warning(f"No GRIB_stepType attribute found, defaulting to time_shift_hours = 0")
+                time_shift_hours = 0
+            else:
+                logger.warning(f"Unknown GRIB_stepType: {step_type}, defaulting to time_shift_hours = 0")
+                time_shift_hours = 0
         except Exception as e:
             logger.warning(f"Could not determine time shift from file metadata: {str(e)}. Using time_shift_hours = 0")
             time_shift_hours = 0
@@ -159,6 +241,11 @@ def process_year(year, variable="tp", input_dir='./', output_dir='./day',
             logger.warning(f"Previous year file not found: {prev_year_file}")
             logger.warning(f"Processing with just the current year file (January 1 may have incomplete data)")
     
+    if rechunk_inputs:
+        scratch_dir = os.path.join(input_dir, "rechunked")
+        files_to_open = [rechunk_input_file(f, scratch_dir, chunk_size, logger)
+                         for f in files_to_open]
+
     # We need to extend our selection window by the absolute time shift to ensure enough data
     start_date = datetime(year, 1, 1)
     end_date = datetime(year + 1, 1, 1)
@@ -178,58 +265,150 @@ def process_year(year, variable="tp", input_dir='./', output_dir='./day',
         time_slice = slice(start_date.isoformat(), end_date.isoformat())
         logger.info(f"Time selection: {start_date.isoformat()} to {end_date.isoformat()}")
     
-    # Open dataset with chunking for parallel processing
+    # Open the files directly rather than through open_mfdataset: the inputs
+    # are consecutive years of one variable on one grid, so combine_by_coords
+    # alignment checks and per-file CF decoding are pure overhead. Open raw
+    # (decode_cf=False), concatenate along time with the cheap compat
+    # settings, and decode once on the result. The target chunking goes
+    # straight into the readers so no rechunk layer is created; h5netcdf is
+    # used for its faster metadata scan when available.
+    try:
+        import h5netcdf  # noqa: F401
+        engine = "h5netcdf"
+    except ImportError:
+        engine = None
     logger.info(f"Opening input files: {files_to_open}")
-    ds = xr.open_mfdataset(files_to_open, 
-                          chunks={"valid_time": -1}).sel(
-                              valid_time=time_slice
-                          ).chunk({"latitude": chunk_size, "longitude": chunk_size})
+    # 720 hours = 30 days per time chunk. A multiple of 24 keeps every daily
+    # group inside a single input chunk (files start at midnight and hold a
+    # whole number of days), so the groupby needs no cross-chunk combine,
+    # while whole-file time chunks would force each spatial tile through one
+    # worker.
+    chunks = {"valid_time": 720, "latitude": chunk_size, "longitude": chunk_size}
+    # ERA5 files carry bookkeeping coordinates (ensemble number, experiment
+    # version) the daily reduce never touches; dropping them at open keeps
+    # their decode/align layers out of every year's graph.
+    dsets = [xr.open_dataset(f, engine=engine, decode_cf=False, chunks=chunks,
+                             drop_variables=["number", "expver"])
+             for f in files_to_open]
+    ds = dsets[0] if len(dsets) == 1 else xr.concat(
+        dsets, dim="valid_time",
+        data_vars="minimal", coords="minimal", compat="override")
+    ds = xr.decode_cf(ds).sel(valid_time=time_slice)
     
     # Examine "method" based on ds[data_var].attrs['GRIB_stepType']
     # Expect `method="sum"` for accumulated variables
-    if ds[data_var].attrs['GRIB_stepType'] == 'accum':
+    data_var = list(ds.data_vars)[0]
+    if ds[data_var].attrs.get('GRIB_stepType') == 'accum':
         if method != 'sum':
             logger.warning(f"Step type of {data_var} is 'accum', but method is '{method}'. Please examine the method setting.")
+
+    # CF scale/offset decoding promotes int16-packed inputs to float64, and
+    # the float64 sticks through the reduce and the output file. ERA5 fields
+    # carry nowhere near float64 precision, so cast back down: halves the
+    # bytes moved through every stage of a bandwidth-bound pipeline.
+    with xr.set_options(keep_attrs=True):
+        ds[data_var] = ds[data_var].astype("float32")
     
     try:
-        # Calculate daily statistics with the specified time shift
+        # Calculate daily statistics with the specified time shift.
+        # Group on shifted day labels directly instead of earthkit's
+        # daily_reduce: shifting the labels rather than the data avoids a
+        # full-array pre-shift copy, and because the labels are monotonic
+        # along time the groups stay contiguous and the spatial chunking
+        # survives into the output.
         logger.info(f"Calculating daily {method} with time shift of {time_shift_hours} hours...")
-        ds_daily = earthkit.transforms.aggregate.temporal.daily_reduce(
-            ds, 
-            how=method, 
-            time_dim="valid_time",
-            time_shift={"hours": time_shift_hours},
-            remove_partial_periods=True
+        day_label = xr.DataArray(
+            (ds["valid_time"].values + np.timedelta64(time_shift_hours, "h"))
+            .astype("datetime64[D]").astype("datetime64[ns]"),
+            dims="valid_time", name="valid_time",
         )
-        
-        # Compute the result
-        # logger.info("Computing results...")
-        ds_daily = ds_daily.compute()
-        
+        try:
+            import flox.xarray as flox_xarray
+        except ImportError:
+            flox_xarray = None
+
+        if flox_xarray is not None:
+            # flox reduces each chunk with one vectorized kernel instead of
+            # xarray's per-label dispatch. Without a shift the day-aligned
+            # time chunks hold every group whole, so "blockwise" drops the
+            # cross-chunk combine stage entirely; a shift moves one boundary
+            # hour into the neighbouring chunk, so flox's own heuristic picks
+            # the combine strategy there.
+            flox_method = "blockwise" if time_shift_hours % 24 == 0 else None
+            with xr.set_options(keep_attrs=True):
+                ds_daily = flox_xarray.xarray_reduce(ds, day_label, func=method,
+                                                     method=flox_method)
+        else:
+            with xr.set_options(keep_attrs=True):
+                ds_daily = getattr(ds.groupby(day_label), method)()
+
+        # Equivalent of daily_reduce's remove_partial_periods=True: the edges
+        # of the shifted window only cover part of a day, so keep only days
+        # backed by a full 24 hours of input.
+        days, counts = np.unique(day_label.values, return_counts=True)
+        ds_daily = ds_daily.sel(valid_time=days[counts == 24])
+
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
-        
+
         # Save the output - include time shift in filename
-        output_file = os.path.join(output_dir, f"era5.reanalysis.{variable}.day{method}.0p25deg.global.{year}.nc")
-        logger.info(f"Saving output to {output_file}")
-        encoding = {
-            list(ds_daily.data_vars.keys())[0]: {
-                # 'chunksizes': (74, 145, 288),  # Time, lat, lon chunks
-                'zlib': True, 'complevel': 1,
-                # 'shuffle': True,
-            }
-        }
-        ds_daily.to_netcdf(output_file, encoding=encoding)
-        
+        output_stem = os.path.join(output_dir, f"era5.reanalysis.{variable}.day{method}.0p25deg.global.{year}")
+
+        def compute_write(delayed_write):
+            # Keep ds_daily lazy and hand the delayed write to the cluster:
+            # reduction and encoding then overlap chunk by chunk on the
+            # workers, and the full year is never materialized in the driver.
+            # Fuse the linear open -> sel -> reduce -> encode chains before
+            # submission: scheduler overhead is paid per task, and without
+            # fusion every chunk carries one task per graph layer.
+            with dask.config.set({"optimization.fuse.active": True,
+                                  "optimization.fuse.subgraphs": True}):
+                if client is not None:
+                    client.compute(delayed_write).result()
+                else:
+                    delayed_write.compute()
+
+        if output_format == "zarr":
+            output_file = output_stem + ".zarr"
+            logger.info(f"Saving output to {output_file}")
+            # Every zarr chunk is an independent object, so workers compress
+            # and write in parallel instead of serializing on one HDF5
+            # handle; the store's default Blosc compressor is kept.
+            compute_write(ds_daily.to_zarr(output_file, mode="w", compute=False))
+        else:
+            output_file = output_stem + ".nc"
+            logger.info(f"Saving output to {output_file}")
+
+            def write_output(var_encoding):
+                encoding = {
+                    list(ds_daily.data_vars.keys())[0]: {
+                        # 'chunksizes': (74, 145, 288),  # Time, lat, lon chunks
+                        # 'shuffle': True,
+                        'dtype': 'float32',
+                        **var_encoding,
+                    }
+                }
+                compute_write(ds_daily.to_netcdf(output_file, encoding=encoding, compute=False))
+
+            if compression == "zstd":
+                try:
+                    # Zstandard (libnetcdf >= 4.9) encodes several times faster
+                    # than DEFLATE at a similar ratio on float fields.
+                    write_output({'compression': 'zstd', 'complevel': 3})
+                except (ValueError, RuntimeError) as e:
+                    logger.warning(f"Zstandard compression unavailable ({e}), falling back to zlib")
+                    write_output({'zlib': True, 'complevel': 1})
+            else:
+                write_output({'zlib': True, 'complevel': 1})
+
         logger.info(f"Finished processing year {year}")
     finally:
-        # Ensure dataset is closed to release resources
+        # Ensure dataset is closed to release resources; the graph and
+        # intermediate references die with the function scope, so no manual
+        # garbage collection is needed (a driver-side gc.collect() walks every
+        # live object for data that lives on the workers anyway).
         logger.info("Closing dataset")
         ds.close()
-        
-        # Force garbage collection to free memory
-        logger.info("Running garbage collection")
-        gc.collect()
 
 
 def main():
@@ -244,12 +423,25 @@ def main():
                       help='Directory to save output files')
     parser.add_argument('--workers', type=int, default=4, 
                       help='Number of dask workers')
-    parser.add_argument('--threads', type=int, default=2, 
+    parser.add_argument('--threads', type=int, default=2,
                       help='Threads per dask worker')
-    parser.add_argument('--chunk-size', type=int, default=180, 
-                      help='Chunk size for spatial dimensions')
+    parser.add_argument('--concurrent-years', type=int, default=1,
+                      help='Number of years processed concurrently on one shared '
+                           'dask cluster (default 1 = sequential, one cluster per year)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                      help='Chunk size for spatial dimensions '
+                           '(default: auto-sized from available RAM and --workers)')
+    parser.add_argument('--rechunk-inputs', action='store_true',
+                      help='One-time nccopy of inputs into <input-dir>/rechunked with '
+                           'day-aligned HDF5 chunks before processing')
     parser.add_argument('--method', type=str, choices=['sum', 'mean', 'max', 'min'],
                       default='sum', help='Aggregation method for daily statistics')
+    parser.add_argument('--compression', type=str, choices=['zlib', 'zstd'], default='zlib',
+                      help='Output compression codec (zstd needs libnetcdf >= 4.9; '
+                           'falls back to zlib when unavailable)')
+    parser.add_argument('--output-format', type=str, choices=['netcdf', 'zarr'], default='netcdf',
+                      help='Output format; zarr lets workers write chunks in parallel '
+                           'without a shared file handle')
     parser.add_argument(
         '--time-shift-hours', type=lambda x: None if x.lower() == 'none' else int(x), default=None,
         help="Time shift in hours (default: None). Use 'none' for no time shift.\n"
@@ -266,25 +458,69 @@ def main():
     # Setup logging
     log_level = getattr(logging, args.log_level)
     logger = setup_logging(log_level=log_level, log_dir=args.log_dir)
-    
+
+    if args.chunk_size is None:
+        # Size spatial tiles so a year-long hourly float32 column fits in a
+        # worker's share of free RAM with a 4x margin for reduce
+        # intermediates. The old fixed 180 put one chunk (~1.7 GB) right at
+        # the default worker budget and triggered spilling on small hosts.
+        hours, bytes_per_cell, safety = 8784, 4, 4
+        mem_per_worker = psutil.virtual_memory().available / args.workers
+        max_chunk = int(math.sqrt(mem_per_worker / safety / (hours * bytes_per_cell)))
+        args.chunk_size = max(30, min(max_chunk, 360))
+        logger.info(f"Auto-selected chunk size {args.chunk_size} "
+                    f"({mem_per_worker / 2**30:.1f} GiB available per worker)")
+
+    # Backpressure for the fan-in reduce: worker-saturation caps in-flight
+    # root (reader) tasks per worker so hourly readers cannot outrun the
+    # daily reducers. Target-based spilling is disabled - worker memory
+    # accounting is conservative enough that it kicks in while real usage is
+    # still low, and once disk-write-read tasks enter the graph they are
+    # orders of magnitude slower than RAM. Data only spills under genuine
+    # pressure (85%) and the worker pauses shortly after (90%).
+    dask.config.set({
+        "distributed.scheduler.worker-saturation": 1.1,
+        "distributed.worker.memory.target": False,
+        "distributed.worker.memory.spill": 0.85,
+        "distributed.worker.memory.pause": 0.9,
+    })
+
     try:
-        # Process each year
-        for year in args.years:
-            # Setup dask client for each year to avoid resource accumulation/leakage
-            logger.info(f"Initializing dask client for year {year} with {args.workers} workers and {args.threads} threads per worker")
-            # Use a context manager to ensure the client is properly closed after each year
+        def run_year(year, client):
+            process_year(
+                year,
+                variable=args.variable,
+                input_dir=args.input_dir,
+                output_dir=args.output_dir,
+                chunk_size=args.chunk_size,
+                client=client,
+                method=args.method,
+                time_shift_hours=args.time_shift_hours,
+                rechunk_inputs=args.rechunk_inputs,
+                compression=args.compression,
+                output_format=args.output_format
+            )
+
+        if args.concurrent_years > 1:
+            # Years are independent, so overlap them on one shared cluster:
+            # while one year's graph is computing, another's metadata scan
+            # and delayed-write submission proceed instead of idling workers.
+            logger.info(f"Initializing shared dask client with {args.workers} workers and {args.threads} threads per worker "
+                        f"for {args.concurrent_years} concurrent years")
             with dask.distributed.Client(n_workers=args.workers, threads_per_worker=args.threads) as client:
-                process_year(
-                    year,
-                    variable=args.variable,
-                    input_dir=args.input_dir,
-                    output_dir=args.output_dir,
-                    chunk_size=args.chunk_size,
-                    client=client,
-                    method=args.method,
-                    time_shift_hours=args.time_shift_hours
-                )
-                
+                with ThreadPoolExecutor(max_workers=args.concurrent_years) as pool:
+                    futures = [pool.submit(run_year, year, client) for year in args.years]
+                    for future in futures:
+                        future.result()
+        else:
+            # Process each year sequentially
+            for year in args.years:
+                # Setup dask client for each year to avoid resource accumulation/leakage
+                logger.info(f"Initializing dask client for year {year} with {args.workers} workers and {args.threads} threads per worker")
+                # Use a context manager to ensure the client is properly closed after each year
+                with dask.distributed.Client(n_workers=args.workers, threads_per_worker=args.threads) as client:
+                    run_year(year, client)
+
         logger.info("All years processed successfully")
     except Exception as e:
         logger.exception(f"Error during processing: {str(e)}")